@@ -1,29 +1,36 @@
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
-import random
-from sqlalchemy import create_engine
+import csv
+from io import StringIO
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy import create_engine, make_url
 from dotenv import load_dotenv
 import os
 
 
+# Gerador único e semeado: a mesma SEED produz o mesmo conjunto de dados
+rng = np.random.default_rng(int(os.environ.get("SEED", "0")))
+
+
 # Gerando dados para dim_tempo
 def gerar_dim_tempo(start_date='2023-01-01', end_date='2023-12-31'):
     dates = pd.date_range(start=start_date, end=end_date, freq='D')
+    n = len(dates)
     dim_tempo = pd.DataFrame({
-        'id_tempo': range(1, len(dates) + 1),
-        'data': dates,
-        'dia': dates.day,
-        'mes': dates.month,
-        'ano': dates.year,
-        'dia_semana': dates.dayofweek,
-        'trimestre': dates.quarter
+        'id_tempo': np.arange(1, n + 1, dtype='int32'),
+        'data': dates.to_numpy(),
+        'dia': dates.day.to_numpy().astype('int8'),
+        'mes': dates.month.to_numpy().astype('int8'),
+        'ano': dates.year.to_numpy().astype('int16'),
+        'dia_semana': dates.dayofweek.to_numpy().astype('int8'),
+        'trimestre': dates.quarter.to_numpy().astype('int8')
     })
     return dim_tempo
 
 # Gerando dados para dim_produto
-def gerar_dim_produto(num_produtos=100):
-    categorias = ['Eletrônicos', 'Roupas', 'Alimentos', 'Móveis', 'Livros']
+def gerar_dim_produto(num_produtos=100, rng=rng):
+    categorias = np.array(['Eletrônicos', 'Roupas', 'Alimentos', 'Móveis', 'Livros'])
     subcategorias = {
         'Eletrônicos': ['Smartphones', 'Notebooks', 'Tablets', 'TVs'],
         'Roupas': ['Camisetas', 'Calças', 'Vestidos', 'Casacos'],
@@ -32,103 +39,183 @@ def gerar_dim_produto(num_produtos=100):
         'Livros': ['Ficção', 'Não-Ficção', 'Infantil', 'Técnico']
     }
     
-    produtos = []
-
-    for i in range(1, num_produtos + 1):
-        categoria = random.choice(categorias)
-        produtos.append({
-            'id_produto': i,
-            'nome_produto': f'Produto_{i}',
-            'categoria': categoria,
-            'subcategoria': random.choice(subcategorias[categoria]),
-            'preco_base': round(random.uniform(10, 1000), 2),
-            'peso': round(random.uniform(0.1, 20), 2)
-        })
+    ids = np.arange(1, num_produtos + 1, dtype='int32')
+    nomes = pd.Index(ids).astype(str)
+
+    # Subcategorias indexadas por (categoria, posição) para sortear tudo de uma vez
+    idx_categoria = rng.integers(0, len(categorias), num_produtos)
+    idx_subcategoria = rng.integers(0, 4, num_produtos)
+    subcategorias_arr = np.array([subcategorias[c] for c in categorias])
+
+    # Colunas já com o tipo final: categóricas montadas direto dos códigos sorteados
+    produtos = {
+        'id_produto': ids,
+        'nome_produto': pd.array('Produto_' + nomes, dtype='string'),
+        'categoria': pd.Categorical.from_codes(idx_categoria, categorias),
+        'subcategoria': pd.Categorical.from_codes(idx_categoria * 4 + idx_subcategoria, subcategorias_arr.ravel()),
+        'preco_base': np.round(rng.uniform(10, 1000, num_produtos), 2),
+        'peso': np.round(rng.uniform(0.1, 20, num_produtos), 2)
+    }
 
-    return pd.DataFrame(produtos)
+    return pd.DataFrame(produtos, copy=False)
 
 # Gerando dados para dim_loja
 
-def gerar_dim_loja(num_lojas=20):
-    estados = ['SP', 'RJ', 'MG', 'RS', 'PR']
-    regioes = ['Sudeste', 'Sul', 'Norte', 'Nordeste', 'Centro-Oeste']
+def gerar_dim_loja(num_lojas=20, rng=rng):
+    estados = np.array(['SP', 'RJ', 'MG', 'RS', 'PR'])
+    regioes = np.array(['Sudeste', 'Sul', 'Norte', 'Nordeste', 'Centro-Oeste'])
     
-    lojas = []
-    for i in range(1, num_lojas + 1):
-        estado = random.choice(estados)
-        lojas.append({
-            'id_loja': i,
-            'nome_loja': f'Loja_{i}',
-            'estado': estado,
-            'cidade': f'Cidade_{i}',
-            'regiao': random.choice(regioes),
-            'tamanho_m2': random.randint(100, 1000)
-        })
-    return pd.DataFrame(lojas)
+    ids = np.arange(1, num_lojas + 1, dtype='int32')
+    nomes = pd.Index(ids).astype(str)
+
+    lojas = {
+        'id_loja': ids,
+        'nome_loja': pd.array('Loja_' + nomes, dtype='string'),
+        'estado': pd.Categorical.from_codes(rng.integers(0, len(estados), num_lojas), estados),
+        'cidade': pd.array('Cidade_' + nomes, dtype='string'),
+        'regiao': pd.Categorical.from_codes(rng.integers(0, len(regioes), num_lojas), regioes),
+        'tamanho_m2': rng.integers(100, 1001, num_lojas, dtype='int16')
+    }
+    return pd.DataFrame(lojas, copy=False)
 
 # Gerando dados para dim_cliente
-def gerar_dim_cliente(num_clientes=1000):
-    segmentos = ['Varejo', 'Atacado', 'Premium']
+def gerar_dim_cliente(num_clientes=1000, rng=rng):
+    segmentos = np.array(['Varejo', 'Atacado', 'Premium'])
+    generos = np.array(['M', 'F'])
+    cidades = 'Cidade_' + pd.RangeIndex(1, 51).astype(str)
     
-    clientes = []
-    for i in range(1, num_clientes + 1):
-        clientes.append({
-            'id_cliente': i,
-            'nome_cliente': f'Cliente_{i}',
-            'segmento': random.choice(segmentos),
-            'idade': random.randint(18, 80),
-            'genero': random.choice(['M', 'F']),
-            'cidade': f'Cidade_{random.randint(1, 50)}'
-        })
-    return pd.DataFrame(clientes)
+    ids = np.arange(1, num_clientes + 1, dtype='int32')
+
+    clientes = {
+        'id_cliente': ids,
+        'nome_cliente': pd.array('Cliente_' + pd.Index(ids).astype(str), dtype='string'),
+        'segmento': pd.Categorical.from_codes(rng.integers(0, len(segmentos), num_clientes), segmentos),
+        'idade': rng.integers(18, 81, num_clientes, dtype='int8'),
+        'genero': pd.Categorical.from_codes(rng.integers(0, len(generos), num_clientes), generos),
+        'cidade': pd.Categorical.from_codes(rng.integers(0, len(cidades), num_clientes), cidades)
+    }
+    return pd.DataFrame(clientes, copy=False)
 
 
 # Gerando dados para fato_vendas
-def gerar_fato_vendas(dim_tempo, dim_produto, dim_loja, dim_cliente, num_vendas=10000):
-    vendas = []
-    for _ in range(num_vendas):
-        id_tempo = random.choice(dim_tempo['id_tempo'])
-        id_produto = random.choice(dim_produto['id_produto'])
-        preco_base = dim_produto[dim_produto['id_produto'] == id_produto]['preco_base'].iloc[0]
-        
-        vendas.append({
-            'id_venda': _ + 1,
-            'id_tempo': id_tempo,
-            'id_produto': id_produto,
-            'id_loja': random.choice(dim_loja['id_loja']),
-            'id_cliente': random.choice(dim_cliente['id_cliente']),
-            'quantidade': random.randint(1, 10),
-            'valor_unitario': round(preco_base * random.uniform(0.9, 1.1), 2),  # Variação de preço
-            'desconto': round(random.uniform(0, 0.2), 2),  # Desconto de 0% a 20%
-            'custo_unitario': round(preco_base * 0.6, 2),  # Custo como 60% do preço base
-        })
-    
-    df_vendas = pd.DataFrame(vendas)
-    df_vendas['valor_total'] = df_vendas['quantidade'] * df_vendas['valor_unitario'] * (1 - df_vendas['desconto'])
-    df_vendas['custo_total'] = df_vendas['quantidade'] * df_vendas['custo_unitario']
-    df_vendas['margem'] = df_vendas['valor_total'] - df_vendas['custo_total']
-    
-    return df_vendas
+def gerar_fato_vendas(dim_tempo, dim_produto, dim_loja, dim_cliente, num_vendas=10000, chunk_size=100_000, rng=rng):
+    ids_tempo = dim_tempo['id_tempo'].to_numpy()
+    ids_produto = dim_produto['id_produto'].to_numpy()
+    precos_produto = dim_produto['preco_base'].to_numpy()
+    ids_loja = dim_loja['id_loja'].to_numpy()
+    ids_cliente = dim_cliente['id_cliente'].to_numpy()
+
+    # Uma coluna contígua por campo, preenchida por blocos e entregue ao DataFrame sem cópia.
+    # Valores monetários em centavos (int64) e desconto em pontos-base (int16, 0 a 2000):
+    # dividir por 100 e 10000, respectivamente, para obter reais e fração
+    vendas = {
+        'id_venda': np.empty(num_vendas, dtype='int32'),
+        'id_tempo': np.empty(num_vendas, dtype='int32'),
+        'id_produto': np.empty(num_vendas, dtype='int32'),
+        'id_loja': np.empty(num_vendas, dtype='int32'),
+        'id_cliente': np.empty(num_vendas, dtype='int32'),
+        'quantidade': np.empty(num_vendas, dtype='int8'),
+        'valor_unitario': np.empty(num_vendas, dtype='int64'),
+        'desconto': np.empty(num_vendas, dtype='int16'),
+        'custo_unitario': np.empty(num_vendas, dtype='int64'),
+        'valor_total': np.empty(num_vendas, dtype='int64'),
+        'custo_total': np.empty(num_vendas, dtype='int64'),
+        'margem': np.empty(num_vendas, dtype='int64'),
+    }
 
+    def _chunk(start, stop):
+        n = stop - start
+        bloco = slice(start, stop)
+
+        # Sorteia as posições dos produtos para resolver id e preço em uma única indexação
+        idx_produto = rng.integers(0, len(ids_produto), n)
+        preco_base = precos_produto[idx_produto]
+
+        quantidade = rng.integers(1, 11, n)
+        valor_unitario = np.round(preco_base * rng.uniform(0.9, 1.1, n) * 100).astype('int64')  # Variação de preço
+        desconto = (np.round(rng.uniform(0, 0.2, n), 2) * 10_000).round().astype('int16')  # Desconto de 0% a 20%
+        custo_unitario = np.round(preco_base * 0.6 * 100).astype('int64')  # Custo como 60% do preço base
+        valor_total = np.round(quantidade * valor_unitario * (10_000 - desconto) / 10_000).astype('int64')
+        custo_total = quantidade * custo_unitario
+
+        vendas['id_venda'][bloco] = np.arange(start + 1, stop + 1)
+        vendas['id_tempo'][bloco] = rng.choice(ids_tempo, n)
+        vendas['id_produto'][bloco] = ids_produto[idx_produto]
+        vendas['id_loja'][bloco] = rng.choice(ids_loja, n)
+        vendas['id_cliente'][bloco] = rng.choice(ids_cliente, n)
+        vendas['quantidade'][bloco] = quantidade
+        vendas['valor_unitario'][bloco] = valor_unitario
+        vendas['desconto'][bloco] = desconto
+        vendas['custo_unitario'][bloco] = custo_unitario
+        vendas['valor_total'][bloco] = valor_total
+        vendas['custo_total'][bloco] = custo_total
+        vendas['margem'][bloco] = valor_total - custo_total
+
+    # Gera em blocos para limitar a memória intermediária com num_vendas grande
+    for start in range(0, num_vendas, chunk_size):
+        _chunk(start, min(start + chunk_size, num_vendas))
+
+    return pd.DataFrame(vendas, copy=False)
+
+
+# Carga em massa via COPY FROM STDIN (PostgreSQL)
+def psql_insert_copy(table, conn, keys, data_iter):
+    dbapi_conn = conn.connection
+    with dbapi_conn.cursor() as cur:
+        buf = StringIO()
+        csv.writer(buf).writerows(data_iter)
+        buf.seek(0)
+
+        columns = ', '.join(f'"{k}"' for k in keys)
+        if table.schema:
+            table_name = f'{table.schema}.{table.name}'
+        else:
+            table_name = table.name
+
+        cur.copy_expert(f'COPY {table_name} ({columns}) FROM STDIN WITH CSV', buf)
+
+
+# Gerando todas as dimensões (independentes entre si)
+# Cada thread recebe um gerador filho para manter o resultado reproduzível
+rng_produto, rng_loja, rng_cliente = rng.spawn(3)
+
+with ThreadPoolExecutor(max_workers=4) as executor:
+    futuros = {
+        'dim_tempo': executor.submit(gerar_dim_tempo),
+        'dim_produto': executor.submit(gerar_dim_produto, rng=rng_produto),
+        'dim_loja': executor.submit(gerar_dim_loja, rng=rng_loja),
+        'dim_cliente': executor.submit(gerar_dim_cliente, rng=rng_cliente),
+    }
+    dims = {nome: futuro.result() for nome, futuro in futuros.items()}
 
-# Gerando todas as dimensões
-dim_tempo = gerar_dim_tempo()
-dim_produto = gerar_dim_produto()
-dim_loja = gerar_dim_loja()
-dim_cliente = gerar_dim_cliente()
+dim_tempo = dims['dim_tempo']
+dim_produto = dims['dim_produto']
+dim_loja = dims['dim_loja']
+dim_cliente = dims['dim_cliente']
 
 
 # Gerando fato vendas
 fato_vendas = gerar_fato_vendas(dim_tempo, dim_produto, dim_loja, dim_cliente)
 
 load_dotenv()
-engine = create_engine(os.environ.get("database_url"))
-
-fato_vendas.to_sql("fato_vendas", con=engine, index=False, if_exists="replace")
-dim_cliente.to_sql("dim_cliente", con=engine, index=False, if_exists="replace")
-dim_loja.to_sql("dim_loja", con=engine, index=False, if_exists="replace")
-dim_produto.to_sql("dim_produto", con=engine, index=False, if_exists="replace")
-dim_tempo.to_sql("dim_tempo", con=engine, index=False, if_exists="replace")
+database_url = make_url(os.environ.get("database_url"))
+
+# No psycopg2, executemany vira INSERTs com múltiplos VALUES no próprio driver
+engine_options = {"echo": False}
+if database_url.get_driver_name() == "psycopg2":
+    engine_options["executemany_mode"] = "values_plus_batch"
+engine = create_engine(database_url, **engine_options)
+
+# COPY no PostgreSQL (psycopg2); nos demais bancos, INSERTs com múltiplas linhas por comando
+insert_method = psql_insert_copy if engine.dialect.driver == "psycopg2" else "multi"
+
+# Todas as tabelas em uma única transação
+with engine.begin() as conn:
+    fato_vendas.to_sql("fato_vendas", con=conn, index=False, if_exists="replace", chunksize=1000, method=insert_method)
+    dim_cliente.to_sql("dim_cliente", con=conn, index=False, if_exists="replace", chunksize=1000, method=insert_method)
+    dim_loja.to_sql("dim_loja", con=conn, index=False, if_exists="replace", chunksize=1000, method=insert_method)
+    dim_produto.to_sql("dim_produto", con=conn, index=False, if_exists="replace", chunksize=1000, method=insert_method)
+    dim_tempo.to_sql("dim_tempo", con=conn, index=False, if_exists="replace", chunksize=1000, method=insert_method)
 
 
 
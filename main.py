@@ -1,117 +1,255 @@
 import re
 import os
 import logging
+import functools
 
 from collections import defaultdict
 from dotenv import load_dotenv
-from sqlalchemy import create_engine, MetaData, inspect
-from typing import Dict, List, Set
+from sqlalchemy import create_engine, inspect, text, Integer, Uuid
+from typing import Dict, FrozenSet, List, Optional, Set, Tuple
+
+
+_NORM_PREFIX = re.compile(r'^(dim_|tb_|tbl_|tab_|fact_|fato_)')
+_NORM_SUFFIX = re.compile(r'(s|es|is)$')
+_VOWEL_DROP = str.maketrans('', '', 'aeiou')
+
+# Tipos aceitos para chaves (Integer cobre BigInteger e SmallInteger)
+_KEY_TYPES = (Integer, Uuid)
 
 
 class DatabaseAnalyzer:
     def __init__(self, url: str):
         self.url = url
         self.engine = create_engine(url)
-        self.metadata = self._get_all_metadata()
         self.inspector = inspect(self.engine)
         
         logging.basicConfig(level=logging.INFO)
         self.logger = logging.getLogger(__name__)
         self.relation_patterns = {
-            'id_pattern': re.compile(r'^(?:id_|id)(\w+)$', re.IGNORECASE),
-            'fk_pattern': re.compile(r'^(?:fk_|fk)(\w+)$', re.IGNORECASE),
-            'table_id_pattern': re.compile(r'^(\w+)_(?:id|cd|codigo)$', re.IGNORECASE),
-            'ref_pattern': re.compile(r'^(?:ref_|reference_)(\w+)$', re.IGNORECASE),
-            'cod_pattern': re.compile(r'^(?:cod_|codigo_)(\w+)$', re.IGNORECASE),
-            'num_pattern': re.compile(r'^(?:num_|numero_)(\w+)$', re.IGNORECASE)
+            'id_pattern': r'(?:id_|id)(?P<id_pattern_body>\w+)',
+            'fk_pattern': r'(?:fk_|fk)(?P<fk_pattern_body>\w+)',
+            'table_id_pattern': r'(?P<table_id_pattern_body>\w+)_(?:id|cd|codigo)',
+            'ref_pattern': r'(?:ref_|reference_)(?P<ref_pattern_body>\w+)',
+            'cod_pattern': r'(?:cod_|codigo_)(?P<cod_pattern_body>\w+)',
+            'num_pattern': r'(?:num_|numero_)(?P<num_pattern_body>\w+)'
+        }
+        # Uma única regex com um grupo nomeado por padrão; match.lastgroup indica qual casou
+        self._combined_pattern = re.compile(
+            '^(?:' + '|'.join(f'(?P<{name}>{pattern})' for name, pattern in self.relation_patterns.items()) + ')$',
+            re.IGNORECASE
+        )
+        self._pattern_bodies = {name: f'{name}_body' for name in self.relation_patterns}
+        # Padrões individuais, usados só quando o primeiro padrão casado não leva a nenhuma tabela
+        self._patterns = {
+            name: re.compile(f'^{pattern}$', re.IGNORECASE)
+            for name, pattern in self.relation_patterns.items()
         }
 
-    def _get_all_metadata(self) -> MetaData:
-        """Obtém todos os metadados do banco de dados."""
-        try:
-            metadata = MetaData()
-            metadata.reflect(bind=self.engine)
-            return metadata
-        except Exception as e:
-            self.logger.error(f"Erro ao obter metadados: {str(e)}")
-            raise
-
-    def _normalize_table_name(self, name: str) -> str:
+    @staticmethod
+    @functools.lru_cache(maxsize=None)
+    def _normalize_table_name(name: str) -> str:
         """Normaliza o nome da tabela para comparação."""
-        name = re.sub(r'^(dim_|tb_|tbl_|tab_|fact_|fato_)', '', name.lower())
-        name = re.sub(r'(s|es|is)$', '', name)
+        name = _NORM_PREFIX.sub('', name.lower())
+        name = _NORM_SUFFIX.sub('', name)
         return name.replace('_', '')
 
-    def _get_all_table_variations(self, table_name: str) -> Set[str]:
+    @staticmethod
+    @functools.lru_cache(maxsize=None)
+    def _get_all_table_variations(table_name: str) -> FrozenSet[str]:
         """Gera variações possíveis do nome da tabela."""
-        variations = set()
-        base_name = self._normalize_table_name(table_name)
-        
+        base_name = DatabaseAnalyzer._normalize_table_name(table_name)
 
-        variations.add(base_name)
-        variations.add(base_name + 's') 
-        variations.add(base_name + 'es')  
-        
-  
-        variations.add(re.sub(r'[aeiou]', '', base_name))
-        
-        return variations
+        return frozenset({
+            base_name,
+            base_name + 's',
+            base_name + 'es',
+            base_name.translate(_VOWEL_DROP)
+        })
 
     def find_implicit_relationships(self) -> Dict[str, List[Dict]]:
         """
         Encontra relacionamentos implícitos entre tabelas baseado em padrões de nomenclatura.
         """
         relationships = defaultdict(list)
-        table_names = {self._normalize_table_name(name): name 
-                      for name in self.metadata.tables.keys()}
-
-        for source_table_name, table in self.metadata.tables.items():
-            for column in table.columns:
-                column_name = column.name.lower()
-   
-                if column.foreign_keys:
+        candidates_by_table = defaultdict(list)
+
+        # Apenas nomes de tabelas/colunas e FKs declaradas: dispensa a reflexão completa do schema
+        try:
+            table_names = self.inspector.get_table_names()
+        except Exception as e:
+            self.logger.error(f"Erro ao obter metadados: {str(e)}")
+            raise
+
+        normalized_tables = {self._normalize_table_name(name): name
+                             for name in table_names}
+
+        # Primeira passada: apenas nomes, sem consultas ao banco
+        for source_table_name in table_names:
+            primary_key_columns = set(
+                self.inspector.get_pk_constraint(source_table_name)['constrained_columns']
+            )
+            foreign_key_columns = {
+                column
+                for fk in self.inspector.get_foreign_keys(source_table_name)
+                for column in fk['constrained_columns']
+            }
+
+            for column in self.inspector.get_columns(source_table_name):
+                if not isinstance(column['type'], _KEY_TYPES):
+                    continue
+                if column['name'] in primary_key_columns:
+                    continue
+                if column['name'] in foreign_key_columns:
                     continue
 
-                matches = {}
+                column_name = column['name'].lower()
 
-                for pattern_name, pattern in self.relation_patterns.items():
-                    match = pattern.match(column_name)
-                    if match:
-                        matched_part = match.group(1)
-                        matches[pattern_name] = matched_part
+                match = self._combined_pattern.match(column_name)
+                if not match:
+                    continue
 
-                if matches:
-                    for pattern_name, matched_part in matches.items():
-                        possible_table_variations = self._get_all_table_variations(matched_part)
-        
-                        for variation in possible_table_variations:
-                            if variation in table_names:
-                                target_table = table_names[variation]
-                                if target_table == source_table_name:
-                                    continue
-
-                                confidence = self._calculate_relationship_confidence(
-                                    source_table_name, 
-                                    target_table, 
-                                    column_name, 
-                                    pattern_name
-                                )
-                                
-                                relationships[source_table_name].append({
-                                    'source_column': column_name,
-                                    'target_table': target_table,
-                                    'pattern_matched': pattern_name,
-                                    'confidence': confidence,
-                                    'suggested_relationship': f"{source_table_name}.{column_name} -> {target_table}.id"
-                                })
+                pattern_name = match.lastgroup
+                target_tables = self._find_target_tables(
+                    match.group(self._pattern_bodies[pattern_name]), normalized_tables, source_table_name
+                )
+
+                # Sem tabela para o primeiro padrão: tenta os padrões seguintes, na ordem
+                if not target_tables:
+                    pattern_names = list(self.relation_patterns)
+                    for fallback_name in pattern_names[pattern_names.index(pattern_name) + 1:]:
+                        fallback = self._patterns[fallback_name].match(column_name)
+                        if not fallback:
+                            continue
+
+                        target_tables = self._find_target_tables(
+                            fallback.group(self._pattern_bodies[fallback_name]), normalized_tables, source_table_name
+                        )
+                        if target_tables:
+                            pattern_name = fallback_name
+                            break
+
+                for target_table in target_tables:
+                    candidates_by_table[source_table_name].append(
+                        (column['name'], target_table, pattern_name)
+                    )
+
+        # Segunda passada: uma única conexão e uma consulta por tabela de origem
+        with self.engine.connect() as conn:
+            for source_table_name, candidates in candidates_by_table.items():
+                checked = self._find_matching_columns(conn, source_table_name, candidates)
+
+                for column, target_table, pattern_name in candidates:
+                    column_name = column.lower()
+                    target_key, has_matching_values = checked.get((column, target_table), ('id', False))
+                    confidence = self._calculate_relationship_confidence(
+                        pattern_name,
+                        has_matching_values
+                    )
+
+                    relationships[source_table_name].append({
+                        'source_column': column_name,
+                        'target_table': target_table,
+                        'pattern_matched': pattern_name,
+                        'confidence': confidence,
+                        'suggested_relationship': f"{source_table_name}.{column_name} -> {target_table}.{target_key}"
+                    })
 
         return dict(relationships)
 
+    def _find_target_tables(self,
+                            matched_part: str,
+                            normalized_tables: Dict[str, str],
+                            source_table_name: str) -> List[str]:
+        """Retorna as tabelas cujo nome normalizado coincide com alguma variação do trecho capturado."""
+        target_tables = []
+
+        # No máximo quatro consultas ao dicionário, uma por variação do nome capturado
+        for variation in self._get_all_table_variations(matched_part):
+            target_table = normalized_tables.get(variation)
+            if target_table is None or target_table == source_table_name:
+                continue
+            target_tables.append(target_table)
+
+        return target_tables
+
+    def _get_target_key_column(self, target_table: str, column_name: str) -> Optional[Dict]:
+        """Retorna a coluna da tabela de destino usada na comparação: 'id' ou a coluna homônima."""
+        columns = {column['name']: column for column in self.inspector.get_columns(target_table)}
+        for key in ('id', column_name):
+            if key in columns:
+                return columns[key]
+        return None
+
+    @staticmethod
+    def _compatible_key_types(source_type, target_type) -> bool:
+        """Indica se as colunas podem ser comparadas sem erro de tipo no banco (inteiro com inteiro, uuid com uuid)."""
+        return any(
+            isinstance(source_type, key_type) and isinstance(target_type, key_type)
+            for key_type in _KEY_TYPES
+        )
+
+    def _quote_identifier(self, conn, name: str, allowed: Set[str]) -> str:
+        """Cita um identificador SQL, aceitando apenas nomes obtidos pelo inspector."""
+        if name not in allowed:
+            raise ValueError(f"Identificador desconhecido: {name}")
+        return conn.dialect.identifier_preparer.quote(name)
+
+    def _find_matching_columns(self,
+                               conn,
+                               source_table: str,
+                               candidates: List[Tuple[str, str, str]]) -> Dict[Tuple[str, str], Tuple[str, bool]]:
+        """
+        Mapeia cada par (coluna, tabela de destino) para a coluna-chave de destino usada e
+        se há valores da coluna presentes na tabela de destino.
+        Todos os candidatos da tabela de origem são verificados em uma única consulta.
+        """
+        checked = {}
+
+        try:
+            table_names = set(self.inspector.get_table_names())
+            source_columns = {column['name']: column for column in self.inspector.get_columns(source_table)}
+            qsrc = self._quote_identifier(conn, source_table, table_names)
+
+            checks = []
+            expressions = []
+            for column, target_table, _ in candidates:
+                key = self._get_target_key_column(target_table, column)
+                if key is None:
+                    continue
+
+                checked[(column, target_table)] = (key['name'], False)
+                if column in source_columns and not self._compatible_key_types(
+                        source_columns[column]['type'], key['type']):
+                    continue
+
+                qcol = self._quote_identifier(conn, column, source_columns)
+                qtgt = self._quote_identifier(conn, target_table, table_names)
+                qkey = conn.dialect.identifier_preparer.quote(key['name'])
+
+                # EXISTS encerra a busca no primeiro valor correspondente
+                checks.append((column, target_table))
+                expressions.append(
+                    f"CASE WHEN EXISTS (SELECT 1 FROM {qsrc} a WHERE EXISTS "
+                    f"(SELECT 1 FROM {qtgt} b WHERE b.{qkey} = a.{qcol})) THEN 1 ELSE 0 END"
+                )
+
+            if not expressions:
+                return checked
+
+            row = conn.execute(text("SELECT " + ", ".join(expressions))).one()
+            for check, found in zip(checks, row):
+                checked[check] = (checked[check][0], bool(found))
+
+        except Exception as e:
+            # Descarta a transação abortada para não afetar as tabelas seguintes na mesma conexão
+            conn.rollback()
+            self.logger.warning(f"Erro ao verificar valores correspondentes: {str(e)}")
+
+        return checked
+
     def _calculate_relationship_confidence(self, 
-                                        source_table: str, 
-                                        target_table: str, 
-                                        column_name: str, 
-                                        pattern_type: str) -> float:
+                                        pattern_type: str, 
+                                        has_matching_values: bool) -> float:
         """
         Calcula um score de confiança para o relacionamento implícito encontrado.
         """
@@ -129,21 +267,8 @@ class DatabaseAnalyzer:
 
         confidence = pattern_confidence.get(pattern_type, 0.3)
 
-        try:
-    
-            query = f"""
-                SELECT COUNT(DISTINCT a.{column_name}) as match_count
-                FROM {source_table} a
-                LEFT JOIN {target_table} b ON a.{column_name} = b.id
-                WHERE b.id IS NOT NULL
-            """
-            result = self.engine.execute(query).scalar()
-            
-            if result > 0:
-                confidence += 0.2
-            
-        except Exception as e:
-            self.logger.warning(f"Erro ao verificar valores correspondentes: {str(e)}")
+        if has_matching_values:
+            confidence += 0.2
 
         return min(1.0, confidence)
 